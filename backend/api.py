@@ -2,25 +2,38 @@
 """Backend REST API for file-organizer.
 Provides JSON REST endpoints only (no HTML/templates).
 """
-from flask import Flask, request, jsonify, Response
-import hmac, uuid
+from flask import Flask, request, jsonify, Response, stream_with_context, send_file
+import hmac, uuid, hashlib
 from flask_cors import CORS
 import threading
 import logging
 import os
 from pathlib import Path
-import shutil, json
-from app.organiser import move_files
+import shutil
+import orjson
+from inotify_simple import INotify, flags
+from flask.json.provider import JSONProvider
+from app.organiser import move_files, delete_empty_dirs, find_empty_dirs
 from app.db import get_disks, upsert_disk, list_categories, upsert_category, delete_category, delete_disk, update_disk, update_category
 import sqlite3
 from app.db import init_db, import_from_json
+from app.db import update_run_status, get_run, create_run, list_runs, merge_categories_from_data, replace_all_categories
 import datetime
+import time
 import platform
+import traceback
+import functools
+import heapq
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 APP_VERSION = "1.1.0"
 
 ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "")
 DB_PATH = Path(os.environ.get("CONFIG_DB", "/var/lib/data_organizer/config.db"))
 LOG_DIR = Path(os.environ.get("LOG_DIR", "/var/log/data_organizer/"))
+# The file browser endpoints are confined to this directory. Resolved once at import.
+BASE_PATH = Path('/mnt').resolve()
+BASE_PATH_STR = str(BASE_PATH)
+BASE_PREFIX = os.path.join(BASE_PATH_STR, '') # With trailing separator, so /mntx doesn't match
 
 # --- Logging Setup ---
 LOG_DIR.mkdir(parents=True, exist_ok=True)
@@ -38,11 +51,37 @@ logging.Formatter.formatTime = (lambda self, record, datefmt=None: datetime.date
 # --- App State ---
 # Simple in-memory state for tracking background task status.
 # For a multi-worker setup, this should be moved to a shared store like Redis.
+# TASK_STATUS is never mutated in place: writers build a new dict under TASK_LOCK and
+# rebind the name, so readers can take the current snapshot without locking.
 TASK_LOCK = threading.Lock()
 TASK_STATUS = {'status': 'idle', 'disk': None, 'last_run_ts': None, 'last_run_status': None}
+# Organizer runs execute one at a time on this reusable worker thread.
+_RUN_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix='organizer-run')
+# disk_usage() probes for the disks page. Shared and bounded, so a hung mount ties up
+# at most one thread however often the page is polled: a path whose last probe is
+# still pending is not probed again until that one returns.
+_PROBE_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix='disk-usage')
+_PROBES_PENDING: dict[str, Future] = {}
+_PROBES_LOCK = threading.Lock()
+
+# Disks and categories are read far more often than they change, so reads are served
+# from memory. The version counters are bumped by this worker's write endpoints; the
+# DB file stamp catches writes made by other gunicorn workers.
+_DISK_VERSION = 0
+_KW_VERSION = 0
 # --- End App State ---
 
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson, used by jsonify() and request.get_json()."""
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 logger = logging.getLogger() # Use root logger
 # Allow CORS for all origins on the API endpoints (can be restricted later)
 CORS(app, resources={r"/api/*": {"origins": "*"}, r"/stream_logs": {"origins": "*"}})
@@ -54,77 +93,154 @@ try:
 except Exception:
     logger.exception('Unable to ensure DB schema on startup')
 
+def _db_stamp() -> tuple:
+    """Returns (mtime, size) of the DB file and its WAL, changing on any committed write."""
+    stamp = []
+    for p in (DB_PATH, DB_PATH.with_name(DB_PATH.name + '-wal')):
+        try:
+            st = p.stat()
+            stamp.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+@functools.lru_cache(maxsize=2)
+def _disks_by_name(version: int, stamp: tuple) -> dict:
+    """Disk records keyed by name. Shared between requests: callers must not mutate them."""
+    return {d['name']: d for d in get_disks(DB_PATH)}
+
+@functools.lru_cache(maxsize=2)
+def _categories(version: int, stamp: tuple) -> list:
+    """All categories with their keywords. Shared between requests: callers must not mutate them."""
+    return list_categories(DB_PATH)
+
+@functools.lru_cache(maxsize=2)
+def _categories_json(version: int, stamp: tuple) -> bytes:
+    """The /api/keywords body, encoded once per change to the categories."""
+    return orjson.dumps(_categories(version, stamp))
+
+class RunLogger:
+    """Writes a single run's log file in the same format as the app log.
+
+    Stands in for the logging.Logger that move_files expects. A named logger per
+    run would stay registered in the logging module for the life of the process.
+    """
+    __slots__ = ('f',)
+
+    def __init__(self, f):
+        self.f = f
+
+    def _write(self, level: str, msg: str, args: tuple):
+        if args:
+            msg = msg % args
+        self.f.write(f"{datetime.datetime.now().astimezone().isoformat()} - {level} - {msg}\n")
+
+    def info(self, msg: str, *args):
+        self._write('INFO', msg, args)
+
+    def error(self, msg: str, *args, exc_info: bool = False):
+        self._write('ERROR', msg, args)
+        if exc_info:
+            self.f.write(traceback.format_exc())
+
+def _set_task_status(**changes):
+    """Publishes a new TASK_STATUS snapshot with the given fields changed."""
+    global TASK_STATUS
+    with TASK_LOCK:
+        TASK_STATUS = {**TASK_STATUS, **changes}
+
 def _execute_run(disk_name: str, source_dir: Path, db_path: Path, db_run_id: int, sorted_root: str = None, dry_run: bool = False):
     """
     A shared helper to execute a file organization run, log it, and update status.
     This is used by both manual and scheduled triggers.
     """
-    from app.db import update_run_status, get_run
-
-    # Retrieve the log file path from the DB entry
-    run_info = get_run(db_path, db_run_id)
-    log_file_path = Path(run_info['log_file']) if run_info and run_info.get('log_file') else LOG_DIR / f"run-unknown-{db_run_id}.log"
-
-    # Set up a run-specific logger
-    run_logger = logging.getLogger(f"run-{db_run_id}")
-    run_logger.setLevel(logging.INFO)
-    run_logger.propagate = False
-    handler = logging.FileHandler(log_file_path)
-    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-    run_logger.addHandler(handler)
-
+    log_file = None
     try:
+        # Retrieve the log file path from the DB entry
+        run_info = get_run(db_path, db_run_id)
+        log_file_path = Path(run_info['log_file']) if run_info and run_info.get('log_file') else LOG_DIR / f"run-unknown-{db_run_id}.log"
+
+        # Line buffered, so the live log stream sees each line as soon as it is written
+        log_file = open(log_file_path, 'a', buffering=1)
+        run_logger = RunLogger(log_file)
         run_logger.info(f"Starting run for {source_dir} (dry_run={dry_run})")
         moved = move_files(source_dir, db_path, dry_run=dry_run, sorted_root=sorted_root, logger=run_logger)
         run_logger.info(f"Completed run for {source_dir}: moved={moved}")
         update_run_status(db_path, db_run_id, 'success', moved)
-        with TASK_LOCK:
-            TASK_STATUS['last_run_status'] = 'success'
+        _set_task_status(last_run_status='success')
     except Exception as e:
-        run_logger.error(f"Error during run for {source_dir}: {e}", exc_info=True)
-        update_run_status(db_path, db_run_id, 'error', 0)
-        with TASK_LOCK:
-            TASK_STATUS['last_run_status'] = 'error'
+        # Runs on a pool thread whose future nobody reads, so nothing may escape
+        # unlogged: use the run's log if it was opened, the app log otherwise.
+        if log_file is not None:
+            run_logger.error(f"Error during run for {source_dir}: {e}", exc_info=True)
+        else:
+            logger.error(f"Error starting run {db_run_id} for {source_dir}: {e}", exc_info=True)
+        try:
+            update_run_status(db_path, db_run_id, 'error', 0)
+        except Exception as e:
+            logger.error(f"Failed to record error status for run {db_run_id}: {e}", exc_info=True)
+        _set_task_status(last_run_status='error')
     finally:
-        with TASK_LOCK:
-            TASK_STATUS['status'] = 'idle'
-            TASK_STATUS['last_run_ts'] = datetime.datetime.utcnow().isoformat() + 'Z'
-        run_logger.removeHandler(handler)
-        handler.close()
+        if log_file is not None:
+            log_file.close()
+        _set_task_status(status='idle', last_run_ts=datetime.datetime.utcnow().isoformat() + 'Z')
+
+_HEALTH_JSON = b'{"status":"ok"}'
 
 @app.route('/api/health', methods=['GET'])
 def health():
-    return jsonify({'status': 'ok'})
+    return Response(_HEALTH_JSON, mimetype='application/json')
+
+def _credentials_digest(username: str, password: str) -> bytes:
+    """Fixed-length digest of a username/password pair, so one compare checks both."""
+    return hashlib.sha256(username.encode()).digest() + hashlib.sha256(password.encode()).digest()
+
+_ADMIN_DIGEST = _credentials_digest('admin', ADMIN_PASSWORD)
 
 @app.route('/api/login', methods=['POST'])
 def api_login():
+    # Login is disabled until ADMIN_PASSWORD is set; no need to compare anything.
+    if not ADMIN_PASSWORD:
+        return jsonify({'error': 'Invalid credentials'}), 401
+
     data = request.get_json(force=True)
     username = data.get('username', '').strip()
     password = data.get('password', '') # Passwords should not be stripped
 
     # Use hmac.compare_digest to prevent timing attacks
-    is_user_ok = hmac.compare_digest(username, 'admin')
-    is_pass_ok = hmac.compare_digest(password, ADMIN_PASSWORD)
-
-    if is_user_ok and is_pass_ok and ADMIN_PASSWORD:
+    if hmac.compare_digest(_credentials_digest(username, password), _ADMIN_DIGEST):
         return jsonify({'status': 'ok'})
     return jsonify({'error': 'Invalid credentials'}), 401
 
+# Neither the version nor the host's uname changes while the process runs, so both
+# response bodies are encoded once.
+_VERSION_JSON = orjson.dumps({'version': APP_VERSION})
+_HOST_INFO = platform.uname()
+_HOST_INFO_JSON = orjson.dumps({
+    'system': _HOST_INFO.system,
+    'release': _HOST_INFO.release,
+    'version': _HOST_INFO.version,
+    'machine': _HOST_INFO.machine,
+    'hostname': _HOST_INFO.node,
+})
+
 @app.route('/api/version', methods=['GET'])
 def api_version():
-    return jsonify({'version': APP_VERSION})
+    return Response(_VERSION_JSON, mimetype='application/json')
 
 @app.route('/api/host-info', methods=['GET'])
 def api_host_info():
     """Returns information about the host OS."""
-    info = platform.uname()
-    return jsonify({
-        'system': info.system,
-        'release': info.release,
-        'version': info.version,
-        'machine': info.machine,
-        'hostname': info.node,
-    })
+    return Response(_HOST_INFO_JSON, mimetype='application/json')
+
+def _safe_resolve(path_param: str) -> str | None:
+    """Resolves a client-supplied path, returning None if it lies outside BASE_PATH.
+
+    Works on plain strings: realpath() output is already normalised, so the
+    containment test is one prefix comparison.
+    """
+    rp = os.path.realpath(path_param)
+    return rp if rp == BASE_PATH_STR or rp.startswith(BASE_PREFIX) else None
 
 @app.route('/api/files', methods=['GET'])
 def api_list_files():
@@ -134,41 +250,76 @@ def api_list_files():
         return jsonify({'error': 'path parameter is required'}), 400
 
     # Security: ensure path is within /mnt
-    base_path = Path('/mnt').resolve()
-    target_path = Path(path_param).resolve()
-
-    if base_path not in target_path.parents and target_path != base_path:
+    target_path = _safe_resolve(path_param)
+    if target_path is None:
         return jsonify({'error': 'Access denied: path is outside the allowed directory'}), 403
 
+    # Counting a sub-directory's items means opening it too, so it is opt-in.
+    with_counts = request.args.get('count') == '1'
+
+    # Open the directory up front so a bad path still gets a proper status code;
+    # once the body starts streaming the status line has already been sent.
     try:
-        files = []
-        for entry in os.scandir(target_path):
-            if entry.name.startswith('.'):
-                continue
-            
-            item_count = None
-            if entry.is_dir():
-                try:
-                    # Count non-hidden items in the directory. Can be slow on large directories.
-                    item_count = len([item for item in os.scandir(entry.path) if not item.name.startswith('.')])
-                except (PermissionError, FileNotFoundError):
-                    item_count = None # Set to None if we can't access the directory
-
-            files.append({
-                'name': entry.name,
-                'path': entry.path,
-                'is_dir': entry.is_dir(),
-                'size': entry.stat().st_size if not entry.is_dir() else None,
-                'modified': entry.stat().st_mtime,
-                'item_count': item_count,
-            })
-        return jsonify(files)
+        entries = os.scandir(target_path)
     except FileNotFoundError:
         return jsonify({'error': 'Directory not found'}), 404
     except Exception as e:
         logger.error("Failed to list files for %s: %s", target_path, e)
         return jsonify({'error': 'Failed to list files'}), 500
 
+    def generate_entries():
+        """Streams the listing as a JSON array, one entry at a time."""
+        sep = b''
+        yield b'['
+        try:
+            with entries:
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        continue
+
+                    # DirEntry caches the file type from the directory read, so is_dir() is free;
+                    # stat() is the only extra syscall per entry and is done once. An entry we
+                    # can't stat (dangling link, symlink loop, unreadable link target) is still
+                    # listed, with null size/modified, so it can be seen and deleted.
+                    try:
+                        is_dir = entry.is_dir()
+                    except FileNotFoundError:
+                        continue # Removed while we were listing
+                    except OSError:
+                        is_dir = False
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        st = None
+                        try:
+                            entry.stat(follow_symlinks=False)
+                        except FileNotFoundError:
+                            continue # Removed while we were listing
+                        except OSError:
+                            pass
+
+                    item_count = None
+                    if is_dir and with_counts:
+                        try:
+                            with os.scandir(entry.path) as it:
+                                item_count = sum(1 for item in it if not item.name.startswith('.'))
+                        except OSError:
+                            item_count = None # Set to None if we can't access the directory
+
+                    yield sep + orjson.dumps({
+                        'name': entry.name,
+                        'path': entry.path,
+                        'is_dir': is_dir,
+                        'size': st.st_size if st is not None and not is_dir else None,
+                        'modified': st.st_mtime if st is not None else None,
+                        'item_count': item_count,
+                    })
+                    sep = b','
+        except Exception as e:
+            logger.error("Failed to list files for %s: %s", target_path, e)
+        yield b']'
+    return Response(stream_with_context(generate_entries()), mimetype='application/json')
+
 @app.route('/api/files', methods=['PUT'])
 def api_rename_file():
     """Renames a file or directory."""
@@ -180,20 +331,18 @@ def api_rename_file():
         return jsonify({'error': 'path and newName are required'}), 400
 
     # Security checks
-    base_path = Path('/mnt').resolve()
-    old_path = Path(path_param).resolve()
-
-    if base_path not in old_path.parents and old_path != base_path:
+    old_path = _safe_resolve(path_param)
+    if old_path is None:
         return jsonify({'error': 'Access denied: path is outside the allowed directory'}), 403
 
-    if not old_path.exists():
+    if not os.path.exists(old_path):
         return jsonify({'error': 'Source path not found'}), 404
 
-    new_path = old_path.parent / new_name
-    if base_path not in new_path.parents and new_path != base_path:
+    new_path = _safe_resolve(os.path.join(os.path.dirname(old_path), new_name))
+    if new_path is None:
         return jsonify({'error': 'Access denied: new path is outside the allowed directory'}), 403
 
-    if new_path.exists():
+    if os.path.exists(new_path):
         return jsonify({'error': 'Destination path already exists'}), 409
 
     try:
@@ -212,20 +361,20 @@ def api_delete_file():
         return jsonify({'error': 'path parameter is required'}), 400
 
     # Security: ensure path is within /mnt
-    base_path = Path('/mnt').resolve()
-    target_path = Path(path_param).resolve()
-
-    if base_path not in target_path.parents and target_path != base_path:
+    target_path = _safe_resolve(path_param)
+    if target_path is None:
         return jsonify({'error': 'Access denied: path is outside the allowed directory'}), 403
 
-    if not target_path.exists():
+    if not os.path.exists(target_path):
         return jsonify({'error': 'File or directory not found'}), 404
 
     try:
-        if target_path.is_dir():
-            # Ensure directory is empty before deleting
-            if any(target_path.iterdir()):
-                return jsonify({'error': 'Directory is not empty'}), 400
+        if os.path.isdir(target_path):
+            # Ensure directory is empty before deleting. One entry is enough to know,
+            # so stop after the first instead of listing the whole directory.
+            with os.scandir(target_path) as it:
+                if next(it, None) is not None:
+                    return jsonify({'error': 'Directory is not empty'}), 400
             os.rmdir(target_path)
             logger.info("Deleted empty directory: %s", target_path)
         else:
@@ -245,22 +394,22 @@ def api_delete_file():
 @app.route('/api/nfo', methods=['GET', 'POST', 'DELETE'])
 def api_nfo_handler():
     """Handles GET, POST, and DELETE for .nfo files associated with a media file."""
-    base_path = Path('/mnt').resolve()
 
     if request.method == 'GET':
         path_param = request.args.get('path', '').strip()
         if not path_param:
             return jsonify({'error': 'path parameter is required'}), 400
 
-        media_path = Path(path_param).resolve()
-        if base_path not in media_path.parents:
+        media_path = _safe_resolve(path_param)
+        if media_path is None or media_path == BASE_PATH_STR:
             return jsonify({'error': 'Access denied'}), 403
 
-        nfo_path = media_path.with_suffix('.nfo')
+        nfo_path = os.path.splitext(media_path)[0] + '.nfo'
         content = ''
-        if nfo_path.exists() and nfo_path.is_file():
+        if os.path.isfile(nfo_path):
             try:
-                content = nfo_path.read_text()
+                with open(nfo_path) as f:
+                    content = f.read()
             except Exception as e:
                 return jsonify({'error': f'Failed to read NFO file: {e}'}), 500
         return jsonify({'content': content})
@@ -270,13 +419,14 @@ def api_nfo_handler():
         path_param = data.get('path', '').strip()
         content = data.get('content', '')
 
-        media_path = Path(path_param).resolve()
-        if base_path not in media_path.parents:
+        media_path = _safe_resolve(path_param)
+        if media_path is None or media_path == BASE_PATH_STR:
             return jsonify({'error': 'Access denied'}), 403
 
-        nfo_path = media_path.with_suffix('.nfo')
+        nfo_path = os.path.splitext(media_path)[0] + '.nfo'
         try:
-            nfo_path.write_text(content)
+            with open(nfo_path, 'w') as f:
+                f.write(content)
             logger.info("Wrote NFO file for %s", media_path)
             return jsonify({'status': 'ok'})
         except Exception as e:
@@ -284,14 +434,14 @@ def api_nfo_handler():
 
     elif request.method == 'DELETE':
         path_param = request.args.get('path', '').strip()
-        media_path = Path(path_param).resolve()
-        if base_path not in media_path.parents:
+        media_path = _safe_resolve(path_param)
+        if media_path is None or media_path == BASE_PATH_STR:
             return jsonify({'error': 'Access denied'}), 403
 
-        nfo_path = media_path.with_suffix('.nfo')
-        if nfo_path.exists() and nfo_path.is_file():
+        nfo_path = os.path.splitext(media_path)[0] + '.nfo'
+        if os.path.isfile(nfo_path):
             try:
-                nfo_path.unlink()
+                os.remove(nfo_path)
                 logger.info("Deleted NFO file for %s", media_path)
             except Exception as e:
                 return jsonify({'error': f'Failed to delete NFO file: {e}'}), 500
@@ -300,26 +450,48 @@ def api_nfo_handler():
 @app.route('/api/disks', methods=['GET'])
 def api_list_disks():
     try:
-        disks_data = get_disks(DB_PATH)
+        disks_data = [dict(d) for d in _disks_by_name(_DISK_VERSION, _db_stamp()).values()]
+    except sqlite3.OperationalError:
+        return jsonify([])
+
+    # Probe every mount at once, so the response takes as long as the slowest
+    # statvfs() rather than the sum of them. A hung mount (e.g. stale NFS) is
+    # reported as timed out instead of holding up the others.
+    probes = []
+    fresh = {}
+    with _PROBES_LOCK:
         for disk in disks_data:
             disk['usage'] = {}
             for key, path in [('source', disk['source_dir']), ('sorted', disk['sorted_dir'])]:
-                try:
-                    if not path:
-                        disk['usage'][key] = {'error': 'Path not configured'}
+                if not path:
+                    disk['usage'][key] = {'error': 'Path not configured'}
+                    continue
+                fut = fresh.get(path)
+                if fut is None:
+                    earlier = _PROBES_PENDING.get(path)
+                    if earlier is not None and not earlier.done():
+                        # Still stuck from an earlier request; don't pile another thread on it
+                        disk['usage'][key] = {'error': 'Timed out reading disk usage'}
                         continue
-                    usage = shutil.disk_usage(path)
-                    disk['usage'][key] = {
-                        'total': usage.total,
-                        'used': usage.used,
-                        'free': usage.free,
-                    }
-                except FileNotFoundError:
-                    disk['usage'][key] = {'error': 'Path not found'}
-                except Exception as e:
-                    disk['usage'][key] = {'error': str(e)}
-    except sqlite3.OperationalError:
-        return jsonify([])
+                    fut = fresh[path] = _PROBES_PENDING[path] = _PROBE_POOL.submit(shutil.disk_usage, path)
+                probes.append((fut, disk, key))
+    wait(fresh.values(), timeout=2.0)
+
+    for fut, disk, key in probes:
+        if not fut.done():
+            disk['usage'][key] = {'error': 'Timed out reading disk usage'}
+            continue
+        try:
+            usage = fut.result()
+            disk['usage'][key] = {
+                'total': usage.total,
+                'used': usage.used,
+                'free': usage.free,
+            }
+        except FileNotFoundError:
+            disk['usage'][key] = {'error': 'Path not found'}
+        except Exception as e:
+            disk['usage'][key] = {'error': str(e)}
     return jsonify(disks_data)
 
 @app.route('/api/validate-path', methods=['GET'])
@@ -382,8 +554,10 @@ def api_add_disk():
     if validation_error:
         return validation_error
 
+    global _DISK_VERSION
     try:
         upsert_disk(DB_PATH, name, source, sorted_dir, None)
+        _DISK_VERSION += 1
     except ValueError as e:
         return jsonify({'error': f'Invalid schedule format: {e}'}), 400
     except sqlite3.OperationalError:
@@ -400,8 +574,10 @@ def api_update_disk(name):
     if validation_error:
         return validation_error
 
+    global _DISK_VERSION
     try:
         update_disk(DB_PATH, name, source, sorted_dir, None)
+        _DISK_VERSION += 1
     except ValueError as e:
         return jsonify({'error': f'Invalid schedule format: {e}'}), 400
     except sqlite3.OperationalError:
@@ -410,8 +586,10 @@ def api_update_disk(name):
 
 @app.route('/api/disks/<name>', methods=['DELETE'])
 def api_delete_disk(name):
+    global _DISK_VERSION
     try:
         delete_disk(DB_PATH, name)
+        _DISK_VERSION += 1
     except sqlite3.OperationalError:
         return jsonify({'error': 'DB not initialized'}), 503
     return jsonify({'status': 'ok'})
@@ -419,10 +597,10 @@ def api_delete_disk(name):
 @app.route('/api/keywords', methods=['GET'])
 def api_get_keywords():
     try:
-        cats = list_categories(DB_PATH)
+        body = _categories_json(_KW_VERSION, _db_stamp())
     except sqlite3.OperationalError:
-        cats = []
-    return jsonify(cats)
+        body = b'[]'
+    return Response(body, mimetype='application/json')
 
 @app.route('/api/keywords', methods=['POST'])
 def api_upsert_keyword():
@@ -431,16 +609,20 @@ def api_upsert_keyword():
     priority = int(data.get('priority', 0))
     target = data.get('target', '').strip()
     keywords = [kw.strip() for kw in data.get('keywords', []) if kw.strip()]
+    global _KW_VERSION
     try:
         upsert_category(DB_PATH, name, priority, target, keywords)
+        _KW_VERSION += 1
     except sqlite3.OperationalError:
         return jsonify({'error': 'DB not initialized'}), 503
     return jsonify({'status': 'ok'})
 
 @app.route('/api/keywords/<name>', methods=['DELETE'])
 def api_delete_keyword(name):
+    global _KW_VERSION
     try:
         ok = delete_category(DB_PATH, name)
+        _KW_VERSION += 1
     except sqlite3.OperationalError:
         return jsonify({'error': 'DB not initialized'}), 503
     if ok:
@@ -451,12 +633,12 @@ def api_delete_keyword(name):
 def api_export_keywords():
     """Exports all keyword categories as a JSON file."""
     try:
-        cats = list_categories(DB_PATH)
+        cats = _categories(_KW_VERSION, _db_stamp())
         # Create a filename with a timestamp
         timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
         filename = f"file-organizer-keywords-{timestamp}.json"
         return Response(
-            json.dumps(cats, indent=2),
+            orjson.dumps(cats, option=orjson.OPT_INDENT_2),
             mimetype='application/json',
             headers={'Content-Disposition': f'attachment;filename={filename}'}
         )
@@ -470,18 +652,18 @@ def api_import_keywords():
     Mode 'replace' (default) overwrites all existing rules.
     Mode 'merge' adds new rules and updates existing ones by name.
     """
+    global _KW_VERSION
     if 'file' not in request.files:
         return jsonify({'error': 'No file part'}), 400
     file = request.files['file']
     mode = request.args.get('mode', 'merge') # Default to safe merge
-    data = json.load(file)
+    data = orjson.loads(file.read())
 
     if mode == 'merge':
-        from app.db import merge_categories_from_data
         merge_categories_from_data(DB_PATH, data)
     else: # Allow explicit 'replace'
-        from app.db import replace_all_categories
         replace_all_categories(DB_PATH, data)
+    _KW_VERSION += 1
     return jsonify({'status': 'ok'})
 
 @app.route('/api/cleanup-empty-dirs', methods=['POST'])
@@ -493,37 +675,36 @@ def api_cleanup_empty_dirs():
         return jsonify({'error': 'No paths provided'}), 400
 
     # Security: ensure all paths are within /mnt
-    base_path = Path('/mnt').resolve()
     for path_str in dir_paths:
-        target_path = Path(path_str).resolve()
-        if base_path not in target_path.parents and target_path != base_path:
+        if _safe_resolve(path_str) is None:
             return jsonify({'error': f'Access denied: {path_str}'}), 403
 
-    from app.organiser import delete_empty_dirs
     result = delete_empty_dirs(dir_paths)
     return jsonify(result)
 
 @app.route('/api/disks/<name>/empty-dirs', methods=['GET'])
 def api_get_empty_dirs(name):
     """Finds all empty subdirectories for a given disk."""
-    disks = get_disks(DB_PATH)
-    match = [d for d in disks if d['name'] == name]
-    if not match:
+    disk = _disks_by_name(_DISK_VERSION, _db_stamp()).get(name)
+    if not disk:
         return jsonify({'error': 'disk not found'}), 404
 
-    disk = match[0]
     source_dir = disk.get('source_dir')
     sorted_dir = disk.get('sorted_dir')
 
-    empty_dirs = []
-    from app.organiser import find_empty_dirs
-
-    if source_dir and Path(source_dir).exists():
-        empty_dirs.extend(find_empty_dirs(Path(source_dir)))
-    if sorted_dir and Path(sorted_dir).exists():
-        empty_dirs.extend(find_empty_dirs(Path(sorted_dir)))
+    # The walks spend their time in scandir/stat, which release the GIL, so the
+    # two trees can be walked side by side.
+    # Each walk sorts its own results, so combining them is a linear merge; the
+    # trees can overlap (sorted dir inside source), which leaves duplicates adjacent.
+    roots = [Path(p) for p in (source_dir, sorted_dir) if p and Path(p).exists()]
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        results = list(ex.map(lambda root: sorted(find_empty_dirs(root)), roots))
 
-    return jsonify(sorted(list(set(empty_dirs))))
+    empty_dirs = []
+    for d in heapq.merge(*results):
+        if not empty_dirs or empty_dirs[-1] != d:
+            empty_dirs.append(d)
+    return jsonify(empty_dirs)
 
 
 @app.route('/api/run', methods=['POST'])
@@ -540,50 +721,43 @@ def api_run():
 
     if disk:
         sorted_root = None
-        disks = get_disks(DB_PATH)
-        match = [d for d in disks if d['name'] == disk]
+        match = _disks_by_name(_DISK_VERSION, _db_stamp()).get(disk)
         if not match:
             return jsonify({'error': 'disk not found'}), 404
-        source = match[0]['source_dir']
-        sorted_root = match[0]['sorted_dir']
+        source = match['source_dir']
+        sorted_root = match['sorted_dir']
 
     if not source:
         return jsonify({'error': 'source required'}), 400
 
+    global TASK_STATUS
+    run_disk = disk or 'Custom Run'
     with TASK_LOCK:
         if TASK_STATUS['status'] == 'running':
             return jsonify({'error': 'A run is already in progress'}), 409 # Conflict
-        TASK_STATUS['status'] = 'running'
-        TASK_STATUS['disk'] = disk or 'Custom Run'
+        TASK_STATUS = {**TASK_STATUS, 'status': 'running', 'disk': run_disk}
 
     # Create run entry first to get db_run_id
-    from app.db import create_run, update_run_status
     run_id_str = str(uuid.uuid4())
-    log_file_path = LOG_DIR / f"run-{TASK_STATUS['disk'].replace(' ', '_')}-{run_id_str[:8]}.log"
-    db_run_id = create_run(DB_PATH, TASK_STATUS['disk'], source, str(log_file_path))
+    log_file_path = LOG_DIR / f"run-{run_disk.replace(' ', '_')}-{run_id_str[:8]}.log"
+    db_run_id = create_run(DB_PATH, run_disk, source, str(log_file_path))
 
-    # Use the shared execution function in a background thread
-    thread = threading.Thread(target=_execute_run, 
-                              args=(TASK_STATUS['disk'], Path(source), DB_PATH, db_run_id, sorted_root, dry_run), 
-                              daemon=True)
-    thread.start()
+    # Use the shared execution function in the background
+    _RUN_POOL.submit(_execute_run, run_disk, Path(source), DB_PATH, db_run_id, sorted_root, dry_run)
 
     return jsonify({'status': 'started', 'run_id': db_run_id})
 
 @app.route('/api/status', methods=['GET'])
 def api_status():
-    with TASK_LOCK:
-        return jsonify(TASK_STATUS)
+    return jsonify(TASK_STATUS)
 
 @app.route('/api/runs', methods=['GET'])
 def api_get_runs():
-    from app.db import list_runs
     runs = list_runs(DB_PATH)
     return jsonify(runs)
 
 @app.route('/api/runs/<int:run_id>', methods=['GET'])
 def api_get_run_log(run_id):
-    from app.db import get_run
     run_info = get_run(DB_PATH, run_id)
     if not run_info or not run_info.get('log_file'):
         return jsonify({'error': 'not found'}), 404
@@ -591,27 +765,58 @@ def api_get_run_log(run_id):
     if not log_path.exists():
         return jsonify({'error': 'log file not found'}), 404
 
-    def generate_log_chunks():
-        """Streams the log file chunk by chunk to avoid high memory usage."""
-        try:
-            with open(log_path, 'rb') as f:
-                while chunk := f.read(4096):
-                    yield chunk
-        except Exception as e:
-            logger.error("Failed to stream log file %s: %s", log_path, e)
-    return Response(generate_log_chunks(), mimetype='text/plain')
+    # send_file hands the open file to the WSGI server, which can use sendfile(2)
+    # rather than copying the log through Python. It also answers If-None-Match /
+    # If-Modified-Since and Range requests.
+    return send_file(log_path, mimetype='text/plain', conditional=True, etag=True)
+
+def _follow_log(log_path: Path, from_end: bool = False, should_stop=None, idle_ms: int = 2000):
+    """Yields lines as they are appended to log_path.
+
+    Blocks in inotify until the file is written to instead of polling it.
+    should_stop() is consulted once after the first full read (so a finished log
+    ends straight away) and then whenever no write arrives for idle_ms; once it
+    returns True the remaining bytes are drained and the generator ends.
+    """
+    with INotify() as inotify, open(log_path, 'rb') as f:
+        # Watch before the first read so no write can slip in between the two.
+        inotify.add_watch(log_path, flags.MODIFY)
+        fd = f.fileno()
+        pos = os.fstat(fd).st_size if from_end else 0
+        pending = b''
+        stopping = False
+        checked_once = False
+        while True:
+            while chunk := os.pread(fd, 1 << 16, pos):
+                pos += len(chunk)
+                *lines, pending = (pending + chunk).split(b'\n')
+                for line in lines:
+                    yield line.decode(errors='replace')
+            if stopping:
+                if pending:
+                    yield pending.decode(errors='replace')
+                return
+            if not checked_once:
+                checked_once = True
+                if should_stop and should_stop():
+                    stopping = True
+                    continue
+            if not inotify.read(timeout=idle_ms) and should_stop and should_stop():
+                stopping = True
 
 @app.route('/stream_run_logs/<int:run_id>')
 def stream_run_logs(run_id):
-    from app.db import get_run
     run_info = get_run(DB_PATH, run_id)
     if not run_info or not run_info.get('log_file'):
         return Response("data: Run not found or log file not specified.\n\n", mimetype='text/event-stream')
 
     log_path = Path(run_info['log_file'])
 
+    def run_finished():
+        current_run_status = get_run(DB_PATH, run_id) # This re-queries the DB
+        return bool(current_run_status and current_run_status['status'] != 'running')
+
     def event_stream():
-        import time
         # Wait for log file to be created
         for _ in range(10): # Wait up to 2 seconds
             if log_path.exists(): break
@@ -622,34 +827,20 @@ def stream_run_logs(run_id):
             yield "data: [STREAM_END]\n\n"
             return
 
-        with open(log_path, 'r') as f:
-            while True:
-                line = f.readline()
-                if not line:
-                    # Check if run is still active before sleeping
-                    current_run_status = get_run(DB_PATH, run_id) # This re-queries the DB
-                    if current_run_status and current_run_status['status'] != 'running':
-                        yield "data: [STREAM_END]\n\n"
-                        break
-                    time.sleep(0.5)
-                    continue
-                yield f"data: {line.strip()}\n\n"
+        # The run status is checked once the existing log is sent, then again
+        # whenever the log goes quiet.
+        for line in _follow_log(log_path, should_stop=run_finished):
+            yield f"data: {line.strip()}\n\n"
+        yield "data: [STREAM_END]\n\n"
     return Response(event_stream(), mimetype='text/event-stream')
 
 @app.route('/stream_logs')
 def stream_logs():
     def event_stream():
-        import time
         # Continuously tail the log file
         try:
-            with open(LOG_DIR / 'organize_files.log', 'r') as f:
-                f.seek(0, 2)
-                while True:
-                    line = f.readline()
-                    if not line:
-                        time.sleep(0.2)
-                        continue
-                    yield f"data: {line.strip()}\n\n"
+            for line in _follow_log(LOG_DIR / 'organize_files.log', from_end=True):
+                yield f"data: {line.strip()}\n\n"
         except Exception as e:
             logger.error("Log streaming failed: %s", e)
     return Response(event_stream(), mimetype='text/event-stream')
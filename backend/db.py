@@ -5,30 +5,88 @@ Schema:
   categories(id INTEGER PK, name TEXT UNIQUE, priority INTEGER, target_dir TEXT)
   keywords(id INTEGER PK, category_id INTEGER, keyword TEXT)
   disks(id INTEGER PK, name TEXT UNIQUE, source_dir TEXT, sorted_dir TEXT)
+  config_meta(id INTEGER PK = 1, version INTEGER) -- bumped by every category/keyword write
 
 This module provides helpers to create the schema, load a config dict (same
 shape as the JSON files used previously), and retrieve disk records.
 """
 import sqlite3
-import json
+import orjson
+import atexit
+import threading
+from itertools import groupby
 from pathlib import Path
 from typing import Dict
-import sqlite3
+
+# Connections stay open for the life of the process, so the page cache and prepared
+# statements survive between helper calls. Helpers therefore never close them; writes
+# are scoped with `with conn:` (commit, or roll back on error). Each thread gets its
+# own connection, as a transaction open on one thread must not pick up another
+# thread's statements.
+_CONN_CACHE: dict[tuple[str, int], sqlite3.Connection] = {}
+_CONN_LOCK = threading.Lock()
+
+# Applied once, when a connection is first opened.
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA mmap_size=67108864",
+    "PRAGMA foreign_keys=ON",
+)
+
+# Statements shared by several helpers. sqlite3 keeps prepared statements in a
+# per-connection cache keyed by SQL text, so one spelling means one cache entry.
+_SQL_CATEGORY_ID = "SELECT id FROM categories WHERE name = ?"
+_SQL_INSERT_KEYWORD = "INSERT INTO keywords (category_id, keyword) VALUES (?, ?)"
+_SQL_DELETE_CATEGORY_KEYWORDS = "DELETE FROM keywords WHERE category_id = ?"
+# Run inside every transaction that writes categories or keywords; see config_version().
+_SQL_BUMP_CONFIG_VERSION = "UPDATE config_meta SET version = version + 1 WHERE id = 1"
+
+# Run timestamps are taken by SQLite itself, in the same local-time text format the
+# Python datetime adapter wrote (at millisecond rather than microsecond precision).
+_SQL_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')"
 
 
 def _get_conn(db_path: Path) -> sqlite3.Connection:
+    key = (str(db_path), threading.get_ident())
+    conn = _CONN_CACHE.get(key)
+    if conn is not None:
+        return conn
+
     db_path.parent.mkdir(parents=True, exist_ok=True)
     # If the database doesn't exist, connect to it (which creates the file)
     # and then immediately initialize the schema.
     if not db_path.exists():
         init_db(db_path, clear_existing=False)
     # All subsequent connections will be to the existing, initialized DB.
-    return sqlite3.connect(str(db_path), timeout=10)
+    # check_same_thread is off only so close_all() can close it from another thread.
+    conn = sqlite3.connect(str(db_path), timeout=10, check_same_thread=False, cached_statements=256)
+    for pragma in _PRAGMAS:
+        conn.execute(pragma)
+    with _CONN_LOCK:
+        _CONN_CACHE[key] = conn
+    return conn
+
+
+@atexit.register
+def close_all():
+    """Closes every cached connection (checkpointing the WAL on the last one)."""
+    with _CONN_LOCK:
+        conns = list(_CONN_CACHE.values())
+        _CONN_CACHE.clear()
+    for conn in conns:
+        conn.close()
 
 
 def init_db(db_path: Path, clear_existing: bool = False):
     db_path.parent.mkdir(parents=True, exist_ok=True)
     conn = sqlite3.connect(str(db_path))
+    # journal_mode=WAL is stored in the file, so the DB is in WAL mode from the
+    # moment it is created; the rest only cover this connection's own commit.
+    for pragma in _PRAGMAS:
+        conn.execute(pragma)
     cur = conn.cursor()
 
     cur.execute("""CREATE TABLE IF NOT EXISTS categories (
@@ -44,6 +102,21 @@ def init_db(db_path: Path, clear_existing: bool = False):
         keyword TEXT,
         FOREIGN KEY(category_id) REFERENCES categories(id)
     )""")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_keywords_category_id ON keywords(category_id)")
+
+    # A single counter that only category/keyword writes move, so the organiser can
+    # tell whether its cached config is stale without re-reading it. The helpers below
+    # bump it once per transaction (_SQL_BUMP_CONFIG_VERSION); per-row triggers would
+    # add a write for every keyword and defeat DELETE's truncate optimisation.
+    cur.execute("""CREATE TABLE IF NOT EXISTS config_meta (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )""")
+    cur.execute("INSERT OR IGNORE INTO config_meta (id, version) VALUES (1, 0)")
+    for table in ("categories", "keywords"):
+        for event in ("insert", "update", "delete"):
+            # Left behind by databases created while the counter was trigger-driven
+            cur.execute(f"DROP TRIGGER IF EXISTS {table}_{event}_bump_version")
 
     cur.execute("""CREATE TABLE IF NOT EXISTS disks (
         id INTEGER PRIMARY KEY,
@@ -63,11 +136,14 @@ def init_db(db_path: Path, clear_existing: bool = False):
         start_ts DATETIME,
         end_ts DATETIME
     )""")
+    # list_runs reads runs newest first
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_runs_start_ts ON runs(start_ts DESC)")
 
     if clear_existing:
         cur.execute("DELETE FROM keywords")
         cur.execute("DELETE FROM categories")
         cur.execute("DELETE FROM disks")
+        cur.execute(_SQL_BUMP_CONFIG_VERSION)
 
     conn.commit()
     conn.close()
@@ -77,23 +153,37 @@ def load_config_from_db(db_path: Path) -> Dict:
     conn = _get_conn(db_path)
     cur = conn.cursor()
 
-    cur.execute("SELECT id, name, priority, target_dir FROM categories")
-    rows = cur.fetchall()
+    # One join instead of a keyword query per category. Ordered by id so categories
+    # (and so ties between equal priorities) keep their insertion order.
+    cur.execute("""SELECT c.name, c.priority, c.target_dir, k.keyword
+        FROM categories c LEFT JOIN keywords k ON k.category_id = c.id
+        ORDER BY c.id, k.id""")
 
     config = {}
-    for row in rows:
-        cid, name, priority, target_dir = row
-        cur.execute("SELECT keyword FROM keywords WHERE category_id = ?", (cid,))
-        kws = [k[0] for k in cur.fetchall()]
-        config[name] = {"keywords": kws, "priority": priority, "target_dir": target_dir}
+    for name, priority, target_dir, kw in cur:
+        info = config.setdefault(name, {"keywords": [], "priority": priority, "target_dir": target_dir})
+        if kw is not None:
+            info["keywords"].append(kw)
 
-    conn.close()
     return config
 
 
+def config_version(db_path: Path) -> int | None:
+    """The categories/keywords version counter, or None if the DB predates it.
+
+    Run bookkeeping (create_run, update_run_status) doesn't move it, so it only
+    changes when the keyword config itself does.
+    """
+    conn = _get_conn(db_path)
+    try:
+        row = conn.execute("SELECT version FROM config_meta WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+
 def import_from_json(db_path: Path, json_path: Path):
-    with open(json_path) as f:
-        categories_data = json.load(f)
+    categories_data = orjson.loads(Path(json_path).read_bytes())
     # This function is designed to be atomic and handles the array format.
     # It's perfect for replacing the old dictionary-based import.
     replace_all_categories(db_path, categories_data)
@@ -101,109 +191,100 @@ def import_from_json(db_path: Path, json_path: Path):
 
 def add_category(db_path: Path, name: str, priority: int, target_dir: str):
     conn = _get_conn(db_path)
-    cur = conn.cursor()
-    cur.execute("INSERT OR IGNORE INTO categories (name, priority, target_dir) VALUES (?, ?, ?)", (name, priority, target_dir))
-    conn.commit()
-    conn.close()
+    with conn:
+        if conn.execute("INSERT OR IGNORE INTO categories (name, priority, target_dir) VALUES (?, ?, ?)", (name, priority, target_dir)).rowcount:
+            conn.execute(_SQL_BUMP_CONFIG_VERSION)
 
 
 def add_keyword(db_path: Path, category_name: str, keyword: str):
     conn = _get_conn(db_path)
-    cur = conn.cursor()
-    cur.execute("SELECT id FROM categories WHERE name = ?", (category_name,))
-    row = cur.fetchone()
-    if not row:
-        conn.close()
-        raise ValueError("category not found")
-    cid = row[0]
-    cur.execute("INSERT INTO keywords (category_id, keyword) VALUES (?, ?)", (cid, keyword))
-    conn.commit()
-    conn.close()
+    with conn:
+        cur = conn.cursor()
+        cur.execute(_SQL_CATEGORY_ID, (category_name,))
+        row = cur.fetchone()
+        if not row:
+            raise ValueError("category not found")
+        cid = row[0]
+        cur.execute(_SQL_INSERT_KEYWORD, (cid, keyword))
+        cur.execute(_SQL_BUMP_CONFIG_VERSION)
 
 
 def list_categories(db_path: Path):
     conn = _get_conn(db_path)
     cur = conn.cursor()
-    cur.execute("SELECT id, name, priority, target_dir FROM categories ORDER BY priority DESC, name")
-    cat_rows = cur.fetchall()
-    
-    # N+1 query fix: Fetch all keywords in one go
-    cur.execute("SELECT category_id, keyword FROM keywords")
-    kw_rows = cur.fetchall()
-    
-    # Group keywords by category_id
-    keywords_by_cat = {}
-    for cid, kw in kw_rows:
-        keywords_by_cat.setdefault(cid, []).append(kw)
+    cur.row_factory = sqlite3.Row
+    # One pass over a join: rows arrive grouped by category, keywords in insertion order.
+    # A category without keywords yields a single row with keyword NULL.
+    cur.execute("""SELECT c.id, c.name, c.priority, c.target_dir, k.keyword
+        FROM categories c LEFT JOIN keywords k ON k.category_id = c.id
+        ORDER BY c.priority DESC, c.name, c.id, k.id""")
 
     cats = []
-    for r in cat_rows:
-        cid, name, priority, target_dir = r
-        kws = keywords_by_cat.get(cid, [])
-        cats.append({"id": cid, "name": name, "priority": priority, "target_dir": target_dir, "keywords": kws})
-    conn.close()
+    for cid, rows in groupby(cur, key=lambda r: r["id"]):
+        first = next(rows)
+        kws = [first["keyword"]] if first["keyword"] is not None else []
+        kws.extend(r["keyword"] for r in rows)
+        cats.append({"id": cid, "name": first["name"], "priority": first["priority"], "target_dir": first["target_dir"], "keywords": kws})
     return cats
 
 
 def delete_disk(db_path: Path, name: str):
     conn = _get_conn(db_path)
-    cur = conn.cursor()
-    cur.execute("DELETE FROM disks WHERE name = ?", (name,))
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute("DELETE FROM disks WHERE name = ?", (name,))
 
 
 def delete_category(db_path: Path, name: str):
     conn = _get_conn(db_path)
-    cur = conn.cursor()
-    cur.execute("SELECT id FROM categories WHERE name = ?", (name,))
-    row = cur.fetchone()
-    if not row:
-        conn.close()
-        return False
-    cid = row[0]
-    cur.execute("DELETE FROM keywords WHERE category_id = ?", (cid,))
-    cur.execute("DELETE FROM categories WHERE id = ?", (cid,))
-    conn.commit()
-    conn.close()
+    with conn:
+        cur = conn.cursor()
+        cur.execute(_SQL_CATEGORY_ID, (name,))
+        row = cur.fetchone()
+        if not row:
+            return False
+        cid = row[0]
+        cur.execute(_SQL_DELETE_CATEGORY_KEYWORDS, (cid,))
+        cur.execute("DELETE FROM categories WHERE id = ?", (cid,))
+        cur.execute(_SQL_BUMP_CONFIG_VERSION)
     return True
 
 
 def update_disk(db_path: Path, name: str, source_dir: str, sorted_dir: str, schedule: str = None):
     conn = _get_conn(db_path)
-    cur = conn.cursor()
-    cur.execute("UPDATE disks SET source_dir = ?, sorted_dir = ?, schedule = ? WHERE name = ?", (source_dir, sorted_dir, schedule, name))
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute("UPDATE disks SET source_dir = ?, sorted_dir = ?, schedule = ? WHERE name = ?", (source_dir, sorted_dir, schedule, name))
 
 
 def update_category(db_path: Path, name: str, priority: int, target_dir: str):
     conn = _get_conn(db_path)
-    cur = conn.cursor()
-    cur.execute("UPDATE categories SET priority = ?, target_dir = ? WHERE name = ?", (priority, target_dir, name))
-    conn.commit()
-    conn.close()
+    with conn:
+        if conn.execute("UPDATE categories SET priority = ?, target_dir = ? WHERE name = ?", (priority, target_dir, name)).rowcount:
+            conn.execute(_SQL_BUMP_CONFIG_VERSION)
 
 
-def upsert_category(db_path: Path, name: str, priority: int, target_dir: str, keywords: list):
-    """Insert or update a category and replace its keywords atomically."""
-    conn = _get_conn(db_path)
-    cur = conn.cursor()
-    # insert or ignore
-    cur.execute("INSERT OR IGNORE INTO categories (name, priority, target_dir) VALUES (?, ?, ?)", (name, priority, target_dir))
-    cur.execute("UPDATE categories SET priority = ?, target_dir = ? WHERE name = ?", (priority, target_dir, name))
-    cur.execute("SELECT id FROM categories WHERE name = ?", (name,))
+def _upsert_category_cur(cur: sqlite3.Cursor, name: str, priority: int, target_dir: str, keywords: list):
+    """Upserts one category on cur; the caller owns the transaction (and bumps the config version)."""
+    # Insert, or update on conflict(name), and get the id back in the same statement
+    cur.execute(
+        "INSERT INTO categories (name, priority, target_dir) VALUES (?, ?, ?) ON CONFLICT(name) DO UPDATE SET priority=excluded.priority, target_dir=excluded.target_dir RETURNING id",
+        (name, priority, target_dir)
+    )
     row = cur.fetchone()
     if not row:
-        conn.close()
         raise ValueError('failed to upsert category')
     cid = row[0]
     # replace keywords
-    cur.execute("DELETE FROM keywords WHERE category_id = ?", (cid,))
-    for kw in keywords:
-        cur.execute("INSERT INTO keywords (category_id, keyword) VALUES (?, ?)", (cid, kw))
-    conn.commit()
-    conn.close()
+    cur.execute(_SQL_DELETE_CATEGORY_KEYWORDS, (cid,))
+    cur.executemany(_SQL_INSERT_KEYWORD, [(cid, kw) for kw in keywords])
+
+
+def upsert_category(db_path: Path, name: str, priority: int, target_dir: str, keywords: list):
+    """Insert or update a category and replace its keywords atomically."""
+    conn = _get_conn(db_path)
+    with conn:
+        cur = conn.cursor()
+        _upsert_category_cur(cur, name, priority, target_dir, keywords)
+        cur.execute(_SQL_BUMP_CONFIG_VERSION)
 
 
 def replace_all_categories(db_path: Path, categories_data: list):
@@ -211,35 +292,39 @@ def replace_all_categories(db_path: Path, categories_data: list):
     conn = _get_conn(db_path)
     cur = conn.cursor()
     try:
-        # Start a transaction
-        cur.execute("BEGIN")
+        # Start a transaction, taking the write lock up front
+        cur.execute("BEGIN IMMEDIATE")
         cur.execute("DELETE FROM keywords")
         cur.execute("DELETE FROM categories")
-        for cat in categories_data:
-            cur.execute("INSERT INTO categories (name, priority, target_dir) VALUES (?, ?, ?)",
-                        (cat['name'], cat['priority'], cat['target_dir']))
-            cat_id = cur.lastrowid
-            for kw in cat.get('keywords', []):
-                cur.execute("INSERT INTO keywords (category_id, keyword) VALUES (?, ?)", (cat_id, kw))
+        # Insert in two bulk statements: all categories, then all keywords once the
+        # new category ids are known. executemany pulls rows from the generators one
+        # at a time, so no second copy of the data is built alongside the parsed JSON.
+        cur.executemany("INSERT INTO categories (name, priority, target_dir) VALUES (?, ?, ?)",
+                        ((cat['name'], cat['priority'], cat['target_dir']) for cat in categories_data))
+        cat_ids = dict(cur.execute("SELECT name, id FROM categories"))
+        cur.executemany(_SQL_INSERT_KEYWORD,
+                        ((cat_ids[cat['name']], kw) for cat in categories_data for kw in cat.get('keywords', [])))
+        cur.execute(_SQL_BUMP_CONFIG_VERSION)
         conn.commit()
     except Exception:
         conn.rollback()
         raise
-    finally:
-        conn.close()
 
 def merge_categories_from_data(db_path: Path, categories_data: list):
     """Merges categories from a list of data, updating existing ones and adding new ones."""
     conn = _get_conn(db_path)
+    cur = conn.cursor()
     try:
+        # One write transaction (and one commit) for the whole merge, taken up
+        # front so a concurrent writer can't force a retry halfway through.
+        cur.execute("BEGIN IMMEDIATE")
         for cat in categories_data:
-            # This re-uses the existing atomic upsert logic for each category
-            upsert_category(db_path, cat['name'], cat['priority'], cat['target_dir'], cat.get('keywords', []))
+            _upsert_category_cur(cur, cat['name'], cat['priority'], cat['target_dir'], cat.get('keywords', []))
+        cur.execute(_SQL_BUMP_CONFIG_VERSION)
+        conn.commit()
     except Exception:
-        # The upsert_category function handles its own transactions, so we just need to catch and re-raise
+        conn.rollback()
         raise
-    finally:
-        conn.close()
 
 
 def get_disks(db_path: Path):
@@ -247,57 +332,47 @@ def get_disks(db_path: Path):
     cur = conn.cursor()
     cur.execute("SELECT name, source_dir, sorted_dir, schedule FROM disks")
     rows = cur.fetchall()
-    conn.close()
     return [dict(name=r[0], source_dir=r[1], sorted_dir=r[2], schedule=r[3]) for r in rows]
 
 
 def upsert_disk(db_path: Path, name: str, source_dir: str, sorted_dir: str, schedule: str = None):
     conn = _get_conn(db_path)
-    cur = conn.cursor()
-    # Use UPSERT: try insert, on conflict(name) update
-    cur.execute(
-        "INSERT INTO disks (name, source_dir, sorted_dir, schedule) VALUES (?, ?, ?, ?) ON CONFLICT(name) DO UPDATE SET source_dir=excluded.source_dir, sorted_dir=excluded.sorted_dir, schedule=excluded.schedule",
-        (name, source_dir, sorted_dir, schedule)
-    )
-    conn.commit()
-    conn.close()
+    with conn:
+        # Use UPSERT: try insert, on conflict(name) update
+        conn.execute(
+            "INSERT INTO disks (name, source_dir, sorted_dir, schedule) VALUES (?, ?, ?, ?) ON CONFLICT(name) DO UPDATE SET source_dir=excluded.source_dir, sorted_dir=excluded.sorted_dir, schedule=excluded.schedule",
+            (name, source_dir, sorted_dir, schedule)
+        )
 
 
 def create_run(db_path: Path, disk_name: str, source_path: str, log_file: str) -> int:
     conn = _get_conn(db_path)
-    cur = conn.cursor()
-    cur.execute("INSERT INTO runs (disk_name, source_path, status, start_ts, log_file) VALUES (?, ?, ?, ?, ?)",
-                (disk_name, source_path, 'running', sqlite3.datetime.datetime.now(), log_file))
-    run_id = cur.lastrowid
-    conn.commit()
-    conn.close()
-    return run_id
+    with conn:
+        cur = conn.execute(f"INSERT INTO runs (disk_name, source_path, status, start_ts, log_file) VALUES (?, ?, ?, {_SQL_NOW}, ?)",
+                           (disk_name, source_path, 'running', log_file))
+    return cur.lastrowid
 
 
 def update_run_status(db_path: Path, run_id: int, status: str, files_moved: int):
     conn = _get_conn(db_path)
-    cur = conn.cursor()
-    cur.execute("UPDATE runs SET status = ?, files_moved = ?, end_ts = ? WHERE id = ?",
-                (status, files_moved, sqlite3.datetime.datetime.now(), run_id))
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute(f"UPDATE runs SET status = ?, files_moved = ?, end_ts = {_SQL_NOW} WHERE id = ?",
+                     (status, files_moved, run_id))
 
 
 def list_runs(db_path: Path):
     conn = _get_conn(db_path)
-    conn.row_factory = sqlite3.Row
     cur = conn.cursor()
+    # Row factory goes on the cursor: the connection is shared with helpers that expect tuples.
+    cur.row_factory = sqlite3.Row
     cur.execute("SELECT * FROM runs ORDER BY start_ts DESC")
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    return rows
+    return [dict(r) for r in cur.fetchall()]
 
 
 def get_run(db_path: Path, run_id: int):
     conn = _get_conn(db_path)
-    conn.row_factory = sqlite3.Row
     cur = conn.cursor()
+    cur.row_factory = sqlite3.Row
     cur.execute("SELECT * FROM runs WHERE id = ?", (run_id,))
     row = cur.fetchone()
-    conn.close()
     return dict(row) if row else None
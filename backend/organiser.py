@@ -5,45 +5,127 @@ This module centralises the logic used by `organise_SRL_Data_2.py` and
 `organise_SRL_Ext.py` so the behaviour is implemented once and can be
 re-used by a CLI or a web UI.
 """
+import copy
+import errno
 import os
 import shutil
-import json
+import threading
+import orjson
 from pathlib import Path
-from typing import Union
+from typing import Iterator, Union
 import sqlite3
 from app import db as dbmod
 import logging
+import ahocorasick
+from operator import itemgetter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from pathlib import Path
 
 
+# Parsed configs by path, with the version token they were read at and their matcher.
+_CFG_CACHE: dict[str, tuple[object, dict, tuple]] = {}
+
+
+def _load_cached(config_path: Path) -> tuple[dict, tuple]:
+    """Returns the (shared) config for config_path and its compiled matcher."""
+    if str(config_path).endswith(".db"):
+        version = dbmod.config_version(config_path)
+    else:
+        st = os.stat(config_path)
+        version = (st.st_mtime_ns, st.st_size)
+
+    cached = _CFG_CACHE.get(str(config_path))
+    if cached and version is not None and cached[0] == version:
+        return cached[1], cached[2]
+
+    if str(config_path).endswith(".db"):
+        config = dbmod.load_config_from_db(config_path)
+    else:
+        config = orjson.loads(Path(config_path).read_bytes())
+    # The matcher holds the lowercased keywords, so the config itself stays in
+    # exactly the JSON/DB shape.
+    matcher = build_matcher(config)
+    _CFG_CACHE[str(config_path)] = (version, config, matcher)
+    return config, matcher
+
+
 def load_config(config_path: Path):
     """Load config from JSON file or sqlite DB (if config_path suffix is .db).
 
-    When a DB path is provided, `db.load_config_from_db` is used.
+    When a DB path is provided, `db.load_config_from_db` is used. Results are
+    cached until the source changes (the DB's config_meta version counter, or
+    JSON file mtime/size); each call returns its own copy, down to the keyword
+    lists, so callers can't change what the cache (and its matcher) holds.
     """
-    if str(config_path).endswith(".db"):
-        return dbmod.load_config_from_db(config_path)
-    with open(config_path) as f:
-        return json.load(f)
+    config = _load_cached(config_path)[0]
+    if isinstance(config, dict):
+        return {name: {**info, "keywords": list(info.get("keywords", []))} for name, info in config.items()}
+    return copy.deepcopy(config)
 
 
-def find_target(file_name: str, config: dict):
+def build_matcher(config: dict) -> tuple:
+    """Compiles every category's keywords into one Aho-Corasick automaton.
+
+    Each lowercased keyword maps to the (priority, -position, target_dir) of the
+    categories that list it, so the best hit is simply the max: highest priority,
+    then the category that comes first in the config, as find_target did before.
+    An empty keyword matches every name and can't go in the automaton, so those
+    categories are kept aside. Returns (automaton or None, always-matching hits).
+    """
+    hits_by_kw = {}
+    always = []
+    for pos, info in enumerate(config.values()):
+        hit = (info.get("priority", 0), -pos, info.get("target_dir"))
+        for kw in info.get("keywords", []):
+            kw = kw.lower()
+            if not kw:
+                always.append(hit)
+            else:
+                hits_by_kw.setdefault(kw, []).append(hit)
+
+    if not hits_by_kw:
+        return None, always
+    automaton = ahocorasick.Automaton()
+    for kw, hits in hits_by_kw.items():
+        automaton.add_word(kw, hits)
+    automaton.make_automaton()
+    return automaton, always
+
+
+def find_target(file_name: str, config: dict, matcher: tuple = None):
+    """Returns the target dir of the best category for file_name, or None.
+
+    With a matcher from build_matcher the name is scanned once for all keywords;
+    without one every keyword of every category is tested in turn.
+    """
+    if matcher is not None:
+        automaton, always = matcher
+        best = max(always) if always else None
+        if automaton is not None:
+            for _, hits in automaton.iter(file_name.lower()):
+                for hit in hits:
+                    if best is None or hit > best:
+                        best = hit
+        if best is not None:
+            return best[2]
+        if "Others" in config:
+            return config["Others"]["target_dir"]
+        return None
+
     lower_name = file_name.lower()
     matches = []
 
     for _, info in config.items():
-        for kw in info.get("keywords", []):
-            if kw.lower() in lower_name:
-                matches.append((info.get("priority", 0), info.get("target_dir")))
-                break
+        if any(kw.lower() in lower_name for kw in info.get("keywords", [])):
+            matches.append((info.get("priority", 0), info.get("target_dir")))
 
     if not matches:
         if "Others" in config:
             return config["Others"]["target_dir"]
         return None
 
-    matches.sort(reverse=True, key=lambda x: x[0])
-    return matches[0][1]
+    # max() keeps the first of equal priorities, like the stable sort it replaces
+    return max(matches, key=itemgetter(0))[1]
 
 
 def ensure_dir_exists(directory: str):
@@ -55,6 +137,116 @@ def ensure_dir_exists(directory: str):
         return False
 
 
+def _iter_files(root) -> Iterator[os.DirEntry]:
+    """Yield a DirEntry for every non-directory below root, top-down.
+
+    Like os.walk, each directory is listed completely before its entries are
+    yielded (so moves made by the caller don't disturb the scan), symlinked
+    directories are neither yielded nor followed, and unreadable directories
+    are skipped.
+    """
+    try:
+        with os.scandir(root) as it:
+            entries = list(it)
+    except OSError:
+        return
+    subdirs = []
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+        if not is_dir:
+            yield entry
+        elif not entry.is_symlink():
+            subdirs.append(entry.path)
+    for sub in subdirs:
+        yield from _iter_files(sub)
+
+
+def _claim_dest(target_dir: str, file_name: str, counters: dict, dry_run: bool = False) -> str:
+    """Pick a free destination for file_name in target_dir.
+
+    Tries ``name``, then ``name_1``, ``name_2``, ... starting from the last
+    suffix handed out for this name in the current run. Outside of a dry run
+    the name is claimed atomically with an O_EXCL placeholder, which the move
+    then replaces, so concurrent runs can't pick the same destination.
+    """
+    name_path = Path(file_name)
+    stem, suffix = name_path.stem, name_path.suffix
+    key = (target_dir, stem, suffix)
+    counter = counters.get(key, 0)
+    while True:
+        name = file_name if counter == 0 else f"{stem}_{counter}{suffix}"
+        candidate = os.path.join(target_dir, name)
+        if dry_run:
+            taken = os.path.lexists(candidate)
+        else:
+            try:
+                os.close(os.open(candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+                taken = False
+            except FileExistsError:
+                taken = True
+        if not taken:
+            counters[key] = counter + 1
+            return candidate
+        counter += 1
+
+
+# Copies between filesystems are IO-bound and release the GIL
+_COPY_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+
+def _move_file(src: str, dst: str, same_fs: bool, is_symlink: bool) -> None:
+    """Move src onto dst (a placeholder from _claim_dest).
+
+    On the same filesystem this is a single os.replace; otherwise, or if the
+    rename turns out to cross a mount point, it falls back to shutil.move.
+    """
+    if same_fs:
+        try:
+            os.replace(src, dst)
+            return
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+    if is_symlink:
+        # shutil.move recreates symlinks across filesystems and won't overwrite
+        os.unlink(dst)
+    shutil.move(src, dst)
+
+
+def _claim_and_move(src: str, target_dir: str, file_name: str, counters: dict, lock: threading.Lock,
+                    same_fs: bool, is_symlink: bool) -> str:
+    """Claims a destination for src in target_dir and moves it there; returns the destination.
+
+    The name is claimed only once the move is about to start, so a run never holds
+    placeholders for queued moves; a failed move removes its placeholder again.
+    """
+    with lock:
+        dst = _claim_dest(target_dir, file_name, counters)
+    try:
+        _move_file(src, dst, same_fs, is_symlink)
+    except Exception:
+        try:
+            os.unlink(dst)
+        except OSError:
+            pass
+        raise
+    return dst
+
+
+def _finish_move(fut, src: str, logger) -> int:
+    """Log the outcome of a pooled move; returns 1 if it succeeded."""
+    try:
+        dst = fut.result()
+    except Exception as e:
+        logger.error("Failed to move %s: %s", src, e)
+        return 0
+    logger.info("Moved: %s -> %s", src, dst)
+    return 1
+
+
 def move_files(source_dir: Path, config_file: Path, dry_run: bool = False, sorted_root: str = None, logger: logging.Logger = None) -> int:
     """Move files from source_dir according to mappings in config_file.
 
@@ -65,23 +257,32 @@ def move_files(source_dir: Path, config_file: Path, dry_run: bool = False, sorte
     logger = logger or logging.getLogger(__name__)
     config = None
     try:
-        config = load_config(config_file)
+        config, matcher = _load_cached(config_file)
         logger.info("Loaded keyword configuration from %s", config_file)
     except Exception as e:
         logger.error("Failed to load config %s: %s", config_file, e)
         raise
 
     total_moved = 0
+    counters = {}
+    # Pooled moves claim their names on the worker threads
+    counters_lock = threading.Lock()
+    try:
+        source_dev = os.stat(source_dir).st_dev
+    except OSError:
+        source_dev = None
+    target_devs = {}
 
-    for root, _, files in os.walk(source_dir):
-        for file_name in files:
-            file_path = Path(root) / file_name
-
+    pool = None
+    pending = {}
+    try:
+        for entry in _iter_files(source_dir):
             # Skip files already inside /Sorted/
-            if "/Sorted/" in str(file_path):
+            if "/Sorted/" in entry.path:
                 continue
 
-            target_dir = find_target(file_name, config)
+            file_name = entry.name
+            target_dir = find_target(file_name, config, matcher)
             if not target_dir:
                 continue
 
@@ -90,47 +291,89 @@ def move_files(source_dir: Path, config_file: Path, dry_run: bool = False, sorte
                 # os.path.join handles if target_dir is absolute
                 target_dir = os.path.join(sorted_root, target_dir)
 
-            if not ensure_dir_exists(target_dir):
-                continue
-
-            dest_path = Path(target_dir) / file_name
+            # Create and stat each target directory once per run, not once per file
+            target_dev = target_devs.get(target_dir)
+            if target_dev is None:
+                if not ensure_dir_exists(target_dir):
+                    continue
+                target_dev = target_devs[target_dir] = os.stat(target_dir).st_dev
 
-            # Handle duplicate names
-            counter = 1
-            final_dest = dest_path
-            while final_dest.exists():
-                final_dest = Path(target_dir) / f"{dest_path.stem}_{counter}{dest_path.suffix}"
-                counter += 1
+            file_path = entry.path
 
             if dry_run:
+                # Handle duplicate names (probing only; nothing is created)
+                try:
+                    final_dest = _claim_dest(target_dir, file_name, counters, dry_run)
+                except OSError as e:
+                    logger.error("Failed to move %s: %s", file_path, e)
+                    continue
                 logger.info("DRY RUN: would move %s -> %s", file_path, final_dest)
                 total_moved += 1
                 continue
 
+            if target_dev != source_dev:
+                # Cross-filesystem moves are copies; overlap them on the pool
+                if pool is None:
+                    pool = ThreadPoolExecutor(max_workers=_COPY_WORKERS)
+                if len(pending) >= 2 * _COPY_WORKERS:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        total_moved += _finish_move(fut, pending.pop(fut), logger)
+                fut = pool.submit(_claim_and_move, file_path, target_dir, file_name, counters, counters_lock,
+                                  False, entry.is_symlink())
+                pending[fut] = file_path
+                continue
+
             try:
-                shutil.move(str(file_path), str(final_dest))
+                final_dest = _claim_and_move(file_path, target_dir, file_name, counters, counters_lock,
+                                             True, entry.is_symlink())
                 logger.info("Moved: %s -> %s", file_path, final_dest)
                 total_moved += 1
             except Exception as e:
                 logger.error("Failed to move %s: %s", file_path, e)
+    finally:
+        for fut in as_completed(pending):
+            total_moved += _finish_move(fut, pending[fut], logger)
+        if pool is not None:
+            pool.shutdown()
 
     logger.info("Completed file organization. Total files moved: %d", total_moved)
     return total_moved
 
 
-def find_empty_dirs(path: Path) -> list[str]:
-    """Recursively finds all empty subdirectories within a given path."""
+def _walk_empty_dirs(path: str) -> list[str]:
     empty_dirs = []
     # Walk bottom-up to find leaf directories first
     for root, dirs, files in os.walk(path, topdown=False):
-        # An empty directory has no files and no subdirectories
-        # We check if the current root is empty by checking its contents.
-        # os.walk(topdown=False) ensures we've processed subdirs already.
-        if not os.listdir(root):
-            empty_dirs.append(str(root))
+        # An empty directory has no files and no subdirectories. os.walk has
+        # already read the directory to produce dirs/files, so there is no need
+        # to list it a second time.
+        if not dirs and not files:
+            empty_dirs.append(root)
     return empty_dirs
 
 
+def find_empty_dirs(path: Path, max_workers: int = 4) -> list[str]:
+    """Recursively finds all empty subdirectories within a given path.
+
+    Each top-level subdirectory is walked on its own thread. On slow or network
+    mounts most of a walk is spent waiting on directory reads, and this lets the
+    reads for different subtrees overlap. Results are not in any particular order.
+    """
+    root = os.fspath(path)
+    try:
+        with os.scandir(root) as it:
+            entries = list(it)
+    except OSError:
+        return []
+    if not entries:
+        return [root]
+
+    subdirs = [e.path for e in entries if e.is_dir(follow_symlinks=False)]
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        return [d for found in ex.map(_walk_empty_dirs, subdirs) for d in found]
+
+
 def delete_empty_dirs(dir_paths: list[str]) -> dict:
     """Deletes a list of directories, verifying they are empty first."""
     logger = logging.getLogger(__name__)
@@ -138,13 +381,21 @@ def delete_empty_dirs(dir_paths: list[str]) -> dict:
     errors = []
     for path_str in dir_paths:
         try:
-            path = Path(path_str)
-            if path.exists() and path.is_dir() and not os.listdir(path):
-                os.rmdir(path)
-                logger.info("Deleted empty directory: %s", path)
-                deleted_count += 1
-            else:
-                errors.append(f"Skipped (not empty or not found): {path_str}")
+            # Stop at the first entry instead of listing the whole directory
+            with os.scandir(path_str) as it:
+                is_empty = next(it, None) is None
+        except (FileNotFoundError, NotADirectoryError):
+            is_empty = False
+        except Exception as e:
+            errors.append(f"Error deleting {path_str}: {e}")
+            continue
+        if not is_empty:
+            errors.append(f"Skipped (not empty or not found): {path_str}")
+            continue
+        try:
+            os.rmdir(path_str)
+            logger.info("Deleted empty directory: %s", path_str)
+            deleted_count += 1
         except Exception as e:
             errors.append(f"Error deleting {path_str}: {e}")
     return {"deleted": deleted_count, "errors": errors}
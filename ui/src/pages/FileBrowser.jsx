@@ -166,7 +166,7 @@ export default function FileBrowser({ title, initialPath }) {
                     </Box>
                   </TableCell>
                   <TableCell>{formatBytes(f.size)}</TableCell>
-                  <TableCell>{new Date(f.modified * 1000).toLocaleString()}</TableCell>
+                  <TableCell>{f.modified === null ? 'N/A' : new Date(f.modified * 1000).toLocaleString()}</TableCell>
                   <TableCell>
                     <Button size="small" onClick={() => setRenamingFile(f)}>Rename</Button>
                     <Button
@@ -367,8 +367,8 @@ function FileBrowserPage() {
                     primary={file.name}
                     secondary={
                       file.is_dir
-                        ? `${file.item_count === null ? '?' : file.item_count} items`
-                        : `${(file.size / 1024).toFixed(2)} KB`
+                        ? (file.item_count === null ? 'Folder' : `${file.item_count} items`)
+                        : (file.size === null ? 'File' : `${(file.size / 1024).toFixed(2)} KB`)
                     }
                   />
                 </ListItemButton>